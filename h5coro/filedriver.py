@@ -1,11 +1,21 @@
+import os
+import threading
 
 class FileDriver:
 
     def __init__(self, resource, credentials):
         self.resource = resource
         self.f = open(resource, "rb")
+        self.lock = threading.Lock()
 
     def read(self, pos, size):
-        self.f.seek(pos)
-        return self.f.read(size)
+        # positional reads do not share a file offset across threads
+        if hasattr(os, "pread"):
+            return os.pread(self.f.fileno(), size, pos)
+        with self.lock:
+            self.f.seek(pos)
+            return self.f.read(size)
 
+    def version(self):
+        stat = os.fstat(self.f.fileno())
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
@@ -0,0 +1,123 @@
+# Copyright (c) 2023, University of Washington
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the University of Washington nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE UNIVERSITY OF WASHINGTON AND CONTRIBUTORS
+# “AS IS” AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE UNIVERSITY OF WASHINGTON OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+###############################################################################
+# H5Cache Class
+###############################################################################
+
+class H5Cache:
+
+    __slots__ = ('lineSize', 'lineMask', 'limit', 'lines', 'size', 'lock', 'inflight')
+
+    #######################
+    # Constructor
+    #######################
+    def __init__(self, lineSize, limit):
+        self.lineSize = lineSize
+        self.lineMask = (0xFFFFFFFFFFFFFFFF - (lineSize-1))
+        self.limit = limit
+
+        # least recently used lines, bounded by limit bytes
+        self.lines = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        # lines being read, so concurrent misses on a line share one read
+        self.inflight = {}
+
+    #######################
+    # lookup
+    #######################
+    def lookup(self, cache_line):
+        with self.lock:
+            line = self.lines.get(cache_line)
+            if line is not None:
+                self.lines.move_to_end(cache_line)
+            return line
+
+    #######################
+    # reserve
+    #
+    #   returns (line, future, owner): the cached line; or the future
+    #   of a read of the line already in flight; or, when owner is
+    #   True, the caller must read the line and then either insert it
+    #   or resolve/fail the reservation
+    #######################
+    def reserve(self, cache_line):
+        with self.lock:
+            line = self.lines.get(cache_line)
+            if line is not None:
+                self.lines.move_to_end(cache_line)
+                return line, None, False
+            future = self.inflight.get(cache_line)
+            if future is not None:
+                return None, future, False
+            self.inflight[cache_line] = Future()
+            return None, self.inflight[cache_line], True
+
+    #######################
+    # resolve
+    #######################
+    def resolve(self, cache_line, line):
+        with self.lock:
+            future = self.inflight.pop(cache_line, None)
+        if future is not None:
+            future.set_result(line)
+
+    #######################
+    # fail
+    #######################
+    def fail(self, cache_line, error):
+        with self.lock:
+            future = self.inflight.pop(cache_line, None)
+        if future is not None:
+            future.set_exception(error)
+
+    #######################
+    # insert
+    #######################
+    def insert(self, cache_line, line):
+        with self.lock:
+            if cache_line in self.lines:
+                self.size -= len(self.lines[cache_line])
+            self.lines[cache_line] = line
+            self.lines.move_to_end(cache_line)
+            self.size += len(line)
+            # evict least recently used lines
+            while self.size > self.limit:
+                _, evicted = self.lines.popitem(last=False)
+                self.size -= len(evicted)
+            future = self.inflight.pop(cache_line, None)
+        # wake up anyone waiting on this line
+        if future is not None:
+            future.set_result(line)
@@ -28,12 +28,16 @@
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import sys
+import threading
 
+from h5coro.h5cache import H5Cache
 from h5coro.h5dataset import H5Dataset
 from h5coro.h5promise import H5Promise, massagePath
 from h5coro.h5metadata import H5Metadata
+from h5coro.h5paths import H5PathTable
 from h5coro.logger import log
-from concurrent.futures import as_completed, ThreadPoolExecutor
+from concurrent.futures import wait, FIRST_COMPLETED, ThreadPoolExecutor
 
 ###############################################################################
 # CONSTANTS
@@ -46,8 +50,15 @@ ERROR_CHECKING_DEFAULT = True
 VERBOSE_DEFAULT = False
 
 CACHE_LINE_SIZE_DEFAULT = 0x400000
+CACHE_LIMIT_DEFAULT = 0x40000000
+BYPASS_CACHE_LINES = 4 # default threshold, in cache lines
+META_CACHE_LIMIT_DEFAULT = 0x8000000
+SHARED_CACHE_SIZE_DEFAULT = 0x40000000
+
+IO_CONCURRENCY_DEFAULT = 32
 
 ENABLE_PREFETCH_DEFAULT = False
+PREFETCH_DEPTH_DEFAULT = 4
 
 ###############################################################################
 # H5Coro Functions
@@ -61,6 +72,15 @@ def inspectThread(resourceObject, path, w_attr):
         log.warn(f'H5Coro encountered an error inspecting {path}: {e}')
         return path, H5Metadata(), {}
 
+def prefetchThread(resourceObject, pos, size):
+    try:
+        resourceObject.ioRequest(pos, size, caching=False, prefetch=True)
+    except Exception as e:
+        log.warn(f'H5Coro encountered an error prefetching {size} bytes at 0x{pos:x}: {e}')
+
+def workerInit(workerState):
+    workerState.inPool = True
+
 def isolateElement(path, group):
     if path.startswith(group):
         element = path[len(group):]
@@ -77,6 +97,10 @@ def isolateElement(path, group):
 
 class H5Coro:
 
+    __slots__ = ('resource', 'driver', 'ioConcurrency', 'workerState', 'executor', 'enablePrefetch', 'prefetchExecutor',
+                 'errorChecking', 'verbose', 'multiProcess', 'cache', 'metaCache', 'bypassCacheThreshold', 'sharedCache',
+                 'pathAddresses', 'metadataTable', 'offsetSize', 'lengthSize', 'baseAddress', 'rootAddress', '__weakref__')
+
     #######################
     # Constructor
     #######################
@@ -85,22 +109,68 @@ class H5Coro:
         driverClass,
         credentials={},
         cacheLineSize = CACHE_LINE_SIZE_DEFAULT,
+        cacheLimit = CACHE_LIMIT_DEFAULT,
+        bypassCacheThreshold = None,
+        metaCacheLineSize = None,
+        metaCacheLimit = META_CACHE_LIMIT_DEFAULT,
+        sharedCache = None,
+        sharedCacheSize = SHARED_CACHE_SIZE_DEFAULT,
         errorChecking = ERROR_CHECKING_DEFAULT,
         verbose = VERBOSE_DEFAULT,
-        multiProcess = False
+        multiProcess = False,
+        ioConcurrency = IO_CONCURRENCY_DEFAULT,
+        enablePrefetch = ENABLE_PREFETCH_DEFAULT,
+        prefetchDepth = PREFETCH_DEPTH_DEFAULT
     ):
         self.resource = resource
         self.driver = driverClass(resource, credentials)
 
+        # shared thread pool for all reads made through this object
+        self.ioConcurrency = ioConcurrency
+        self.workerState = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=ioConcurrency, initializer=workerInit, initargs=(self.workerState,))
+
+        # separate pool for speculative reads so they never hold up requested ones
+        self.enablePrefetch = enablePrefetch and not multiProcess
+        self.prefetchExecutor = None
+        if self.enablePrefetch:
+            self.prefetchExecutor = ThreadPoolExecutor(max_workers=prefetchDepth)
+
         self.errorChecking = errorChecking
         self.verbose = verbose
         self.multiProcess = multiProcess
 
-        self.cacheLineSize = cacheLineSize
-        self.cacheLineMask = (0xFFFFFFFFFFFFFFFF - (cacheLineSize-1))
+        # separate caches for dataset values and for file metadata
+        # (object headers, heaps, b-tree nodes) so that large data
+        # reads do not evict the metadata needed to find them; the
+        # metadata lines are the size of the data lines unless given
+        if metaCacheLineSize == None:
+            metaCacheLineSize = cacheLineSize
+        self.cache = H5Cache(cacheLineSize, cacheLimit)
+        self.metaCache = H5Cache(metaCacheLineSize, metaCacheLimit)
+
+        # data reads at least this large are streamed rather than cached
+        self.bypassCacheThreshold = bypassCacheThreshold
+        if bypassCacheThreshold == None:
+            self.bypassCacheThreshold = cacheLineSize * BYPASS_CACHE_LINES
 
-        self.cache = {}
-        self.pathAddresses = {}
+        # optional cache file shared by every process reading this resource,
+        # and kept across runs; lines are keyed by the version of the
+        # resource (when the driver reports one) so stale lines are not used,
+        # and the cache is not used when the driver cannot tell the version
+        self.sharedCache = None
+        if sharedCache != None:
+            from h5coro.h5sharedcache import H5SharedCache # requires fcntl (posix only)
+            resource_key = resource
+            if hasattr(self.driver, 'version'):
+                version = self.driver.version()
+                resource_key = version and f'{resource}@{version}' or None
+            if resource_key == None:
+                log.warn(f'H5Coro could not determine the version of {resource}, not using the shared cache')
+            else:
+                self.sharedCache = H5SharedCache(sharedCache, resource_key, cacheLineSize, sharedCacheSize)
+
+        self.pathAddresses = H5PathTable()
         self.metadataTable = {}
 
         self.offsetSize = 0
@@ -108,6 +178,49 @@ class H5Coro:
         self.baseAddress = 0
         self.rootAddress = H5Dataset.readSuperblock(self)
 
+    #######################
+    # Destructor
+    #######################
+    def __del__(self):
+        if hasattr(self, 'executor'):
+            self.close()
+
+    #######################
+    # close
+    #######################
+    def close(self):
+        self.executor.shutdown(wait=False)
+        if self.prefetchExecutor != None:
+            self.prefetchExecutor.shutdown(wait=False, cancel_futures=True)
+
+    #######################
+    # cacheLineSize
+    #
+    #   line size of the data cache (read only)
+    #######################
+    @property
+    def cacheLineSize(self):
+        return self.cache.lineSize
+
+    #######################
+    # cacheLineMask
+    #
+    #   line mask of the data cache (read only)
+    #######################
+    @property
+    def cacheLineMask(self):
+        return self.cache.lineMask
+
+    #######################
+    # inPool
+    #
+    #   True when called from one of this object's worker threads;
+    #   work submitted from there is run inline so that a worker never
+    #   blocks waiting on the (bounded) pool it is occupying
+    #######################
+    def inPool(self):
+        return getattr(self.workerState, 'inPool', False)
+
     #######################
     # readDatasets
     #######################
@@ -142,13 +255,12 @@ class H5Coro:
         H5Dataset(self, path, earlyExit=False, metaOnly=True, enableAttributes=w_attr)
 
         # pull out links and attributes from pathAddresses
-        for _path in self.pathAddresses.keys():
-            element = isolateElement(_path, path)
-            if element != None:
-                if _path in self.metadataTable and self.metadataTable[_path].isattribute:
-                    attributes[element] = None
-                else:
-                    links.add(element)
+        for element in self.pathAddresses.children(path):
+            _path = path and f'{path}/{element}' or element
+            if _path in self.metadataTable and self.metadataTable[_path].isattribute:
+                attributes[element] = None
+            else:
+                links.add(element)
 
         # pull out metadata from metadataTable
         if path in self.metadataTable:
@@ -178,19 +290,21 @@ class H5Coro:
         links, attributes, _ = self.inspectPath(path, w_attr)
         # inspect each link to get metadata, attributes, group info, etc
         if len(links) > 0:
-            executor = ThreadPoolExecutor(max_workers=(len(links) + len(attributes)))
-            futures = [executor.submit(inspectThread, self, f'{path}/{link}', w_attr) for link in links]
-            for future in as_completed(futures):
-                name, metadata, attrs = future.result() # overwrites attribute set
-                element = isolateElement(name, path)
-                if metadata == None: # group
-                    groups[element] = {}
-                    for attr in attrs:
-                        groups[element][attr] = attrs[attr]
-                elif metadata.type != None: # variable
-                    variables[element] = {'__metadata__': metadata}
-                    for attr in attrs:
-                        variables[element][attr] = attrs[attr]
+            pending = {self.executor.submit(inspectThread, self, f'{path}/{link}', w_attr) for link in links}
+            while pending:
+                # process all of the inspections that have completed since the last pass
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, metadata, attrs = future.result() # overwrites attribute set
+                    element = isolateElement(name, path)
+                    if metadata == None: # group
+                        groups[element] = {}
+                        for attr in attrs:
+                            groups[element][attr] = attrs[attr]
+                    elif metadata.type != None: # variable
+                        variables[element] = {'__metadata__': metadata}
+                        for attr in attrs:
+                            variables[element][attr] = attrs[attr]
 
         # return results
         return variables, attributes, groups
@@ -198,42 +312,145 @@ class H5Coro:
     #######################
     # ioRequest
     #######################
-    def ioRequest(self, pos, size, caching=True, prefetch=False):
+    def ioRequest(self, pos, size, caching=True, prefetch=False, metadata=False):
+        start_pos = pos + self.baseAddress
+        # Check if Large Data Read (not worth caching)
+        if caching and not metadata and size >= self.bypassCacheThreshold:
+            return memoryview(self.driver.read(start_pos, size))
         # Check if Caching
-        if caching:
-            data_blocks = []
-            data_to_read = size
-            while data_to_read > 0:
-                # Calculate Cache Line
-                cache_line = (pos + self.baseAddress) & self.cacheLineMask
-                # Populate Cache (if not there already)
-                if cache_line not in self.cache:
-                    self.cache[cache_line] = memoryview(self.driver.read(cache_line, self.cacheLineSize))
-                # Update Indexes
-                start_index = (pos + self.baseAddress) - cache_line
-                stop_index = min(start_index + data_to_read, self.cacheLineSize)
-                data_read = stop_index - start_index
-                data_to_read -= data_read
-                pos += data_read
-                # Grab slice of memory from cache
-                data_blocks += self.cache[cache_line][start_index:stop_index],
-
-            if len(data_blocks) == 1:
-                return data_blocks[0]
-            else:
-                return b''.join(data_blocks)
+        elif caching:
+            cache = metadata and self.metaCache or self.cache
+            line_size = cache.lineSize
+            line_mask = cache.lineMask
+            first_line = start_pos & line_mask
+            # Single Line - slice of cache line (no copy)
+            start_index = start_pos - first_line
+            if start_index + size <= line_size:
+                line = cache.lookup(first_line)
+                if line is None:
+                    line = self.cacheLines(cache, first_line, first_line)[first_line]
+                return line[start_index:start_index+size]
+            # Find Cache Lines Covering Request
+            last_line = (start_pos + size - 1) & line_mask
+            lines = self.cacheLines(cache, first_line, last_line)
+            # Multiple Lines - copy slices of memory from cache
+            stop_pos = start_pos + size
+            data_block = memoryview(bytearray(size))
+            for cache_line in range(first_line, last_line + 1, line_size):
+                start_index = max(start_pos, cache_line) - cache_line
+                stop_index = min(stop_pos - cache_line, line_size)
+                data_index = cache_line + start_index - start_pos
+                data_block[data_index:data_index+stop_index-start_index] = lines[cache_line][start_index:stop_index]
+            return data_block
         # Prefetch
         elif prefetch:
-            block_size = size + ((self.cacheLineSize - (size % self.cacheLineSize)) % self.cacheLineSize) # align to cache line boundary
-            cache_line = (pos + self.baseAddress) & self.cacheLineMask
-            data_block = memoryview(self.driver.read(cache_line, block_size))
-            data_index = 0
-            while data_index < block_size:
-                # Cache the Line
-                self.cache[cache_line] = data_block[data_index:data_index+self.cacheLineSize]
-                cache_line += self.cacheLineSize
-                data_index += self.cacheLineSize
+            cache = metadata and self.metaCache or self.cache
+            line_mask = cache.lineMask
+            self.cacheLines(cache, start_pos & line_mask, (start_pos + size - 1) & line_mask)
             return None
         # Direct Read
         else:
-            return self.driver.read(pos + self.baseAddress, size)
+            return memoryview(self.driver.read(start_pos, size))
+
+    #######################
+    # prefetch
+    #
+    #   speculatively read [pos, pos+size) into the cache in the
+    #   background; does nothing unless prefetching is enabled, or
+    #   when the read is large enough that it would bypass the cache
+    #######################
+    def prefetch(self, pos, size):
+        if self.prefetchExecutor != None and size < self.bypassCacheThreshold:
+            self.prefetchExecutor.submit(prefetchThread, self, pos, size)
+
+    #######################
+    # cacheLines
+    #
+    #   returns the lines from first_line to last_line, reading any
+    #   that are missing from the cache (one read per run of
+    #   consecutive missing lines); lines already being read by
+    #   another thread are waited on rather than read again
+    #######################
+    def cacheLines(self, cache, first_line, last_line):
+        line_size = cache.lineSize
+        reserve = cache.reserve
+        insert = cache.insert
+        shared_cache = self.sharesCache(cache) and self.sharedCache or None
+        lines = {}
+        missing_lines = []
+        inflight_lines = {}
+        reserved_lines = set() # reserved by this call and not yet filled
+        try:
+            for cache_line in range(first_line, last_line + 1, line_size):
+                line, future, owner = reserve(cache_line)
+                if owner:
+                    reserved_lines.add(cache_line)
+                    line = self.otherCacheLookup(cache, cache_line)
+                    if line is None and shared_cache != None:
+                        line = shared_cache.lookup(cache_line)
+                        if line is not None:
+                            insert(cache_line, line)
+                    if line is None:
+                        missing_lines.append(cache_line)
+                    else:
+                        cache.resolve(cache_line, line)
+                        reserved_lines.discard(cache_line)
+                elif line is None:
+                    inflight_lines[cache_line] = future
+                lines[cache_line] = line
+            # group missing lines into runs of consecutive lines
+            runs = []
+            for cache_line in missing_lines:
+                if len(runs) > 0 and cache_line == runs[-1][0] + (runs[-1][1] * line_size):
+                    runs[-1][1] += 1
+                else:
+                    runs.append([cache_line, 1])
+            # read all runs and split them into lines
+            for run_line, run_count in runs:
+                data_block = memoryview(self.driver.read(run_line, run_count * line_size))
+                for i in range(run_count):
+                    cache_line = run_line + (i * line_size)
+                    line = data_block[i*line_size:(i+1)*line_size]
+                    lines[cache_line] = line
+                    insert(cache_line, line)
+                    reserved_lines.discard(cache_line)
+                    if shared_cache != None:
+                        shared_cache.insert(cache_line, line)
+        finally:
+            # fail any line left reserved (including on KeyboardInterrupt)
+            # so that threads waiting on it, and later reads, do not hang
+            if len(reserved_lines) > 0:
+                error = sys.exc_info()[1]
+                if not isinstance(error, Exception):
+                    error = RuntimeError('read of cache line was interrupted')
+                for cache_line in reserved_lines:
+                    cache.fail(cache_line, error)
+        # wait on lines read by other threads
+        for cache_line, future in inflight_lines.items():
+            lines[cache_line] = future.result()
+        return lines
+
+    #######################
+    # sharesCache
+    #
+    #   lines are only shared with the cache file when they are the
+    #   same size as the lines it was created with
+    #######################
+    def sharesCache(self, cache):
+        return self.sharedCache != None and self.sharedCache.lineSize == cache.lineSize
+
+    #######################
+    # otherCacheLookup
+    #
+    #   slices the line out of the other cache when one of its
+    #   lines fully covers it
+    #######################
+    def otherCacheLookup(self, cache, cache_line):
+        other = cache is self.metaCache and self.cache or self.metaCache
+        if other.lineSize >= cache.lineSize:
+            other_line = cache_line & other.lineMask
+            other_data = other.lookup(other_line)
+            if other_data is not None:
+                start_index = cache_line - other_line
+                return other_data[start_index:start_index+cache.lineSize]
+        return None
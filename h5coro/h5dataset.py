@@ -32,6 +32,7 @@ from h5coro.logger import log
 from datetime import datetime
 from multiprocessing import shared_memory, Process
 import struct
+import sys
 import zlib
 import ctypes
 import numpy
@@ -79,6 +80,7 @@ class H5Dataset:
     #######################
     # local
     CUSTOM_V1_FLAG          = 0x80
+    PREFETCH_THRESHOLD      = 2 # chunks read before prefetching starts
     # signatures
     H5_SIGNATURE_LE         = 0x0A1A0A0D46444889
     H5_OHDR_SIGNATURE_LE    = 0x5244484F
@@ -120,12 +122,13 @@ class H5Dataset:
         self.currObjHdrPos          = 0
         self.numElements            = 1 # recalculated below
         self.shape                  = [] # recalculated below
-        self.dataset                = dataset
+        self.dataset                = sys.intern(dataset)
         self.hyperslice             = hyperslice
         self.datasetPath            = list(filter(('').__ne__, self.dataset.split('/')))
         self.datasetPathLevels      = len(self.datasetPath)
         self.datasetFound           = False
         self.dataChunkBufferSize    = 0
+        self.chunksRead             = 0
         self.meta                   = H5Metadata()
         self.sharedBuffer           = None
         self.values                 = None
@@ -212,10 +215,14 @@ class H5Dataset:
         # read compact and contiguous layouts
         # ###################################
         if (self.meta.layout == self.COMPACT_LAYOUT) or (self.meta.layout == self.CONTIGUOUS_LAYOUT):
-            if self.meta.ndims == 0:
-                buffer = self.resourceObject.ioRequest(self.meta.address, buffer_size, caching=False)
+            if self.meta.isattribute or (self.meta.layout == self.COMPACT_LAYOUT):
+                # values stored in the object header were read into the metadata cache with it
+                compact_buffer = self.resourceObject.ioRequest(self.meta.address, buffer_size, metadata=True)
             else:
                 compact_buffer = self.resourceObject.ioRequest(self.meta.address, buffer_size, caching=False)
+            if self.meta.ndims == 0:
+                buffer = bytes(compact_buffer) # copy so values do not hold on to a cache line
+            else:
                 self.readSlice(buffer, self.shape, self.hyperslice, compact_buffer, self.meta.dimensions, self.hyperslice)
 
         # ###################################
@@ -272,7 +279,7 @@ class H5Dataset:
             if self.meta.ndims > 1:
                 self.values = self.values.reshape(self.shape)
         elif self.meta.type == H5Metadata.STRING_TYPE:
-            self.values = ctypes.create_string_buffer(buffer).value.decode('ascii')
+            self.values = ctypes.create_string_buffer(bytes(buffer)).value.decode('ascii')
         else:
             log.warn(f'{self.dataset} is an unsupported datatype {self.meta.type}: unable to populate values')
             
@@ -289,7 +296,7 @@ class H5Dataset:
     # readField
     #######################
     def readField(self, size):
-        raw = self.resourceObject.ioRequest(self.pos, size)
+        raw = self.resourceObject.ioRequest(self.pos, size, metadata=True)
         self.pos += size
         return struct.unpack(f'<{SIZE_2_FORMAT[size]}', raw)[0]
 
@@ -297,7 +304,7 @@ class H5Dataset:
     # readArray
     #######################
     def readArray(self, size):
-        raw = self.resourceObject.ioRequest(self.pos, size)
+        raw = self.resourceObject.ioRequest(self.pos, size, metadata=True)
         self.pos += size
         return raw
 
@@ -310,7 +317,7 @@ class H5Dataset:
     #######################
     def readSuperblock(resourceObject):
         # read start of superblock
-        block = resourceObject.ioRequest(0, 9)
+        block = resourceObject.ioRequest(0, 9, metadata=True)
         signature, superblock_version = struct.unpack(f'<QB', block)
 
         # check file signature
@@ -325,7 +332,7 @@ class H5Dataset:
         if superblock_version == 0:
             if resourceObject.errorChecking:
                 # read start of superblock
-                block = resourceObject.ioRequest(9, 2)
+                block = resourceObject.ioRequest(9, 2, metadata=True)
                 freespace_version, roottable_version = struct.unpack(f'<BB', block)
 
                 # check free space version
@@ -337,29 +344,29 @@ class H5Dataset:
                     raise FatalError(f'unsupported root table version: {roottable_version}')
 
             # read sizes
-            block = resourceObject.ioRequest(13, 2)
+            block = resourceObject.ioRequest(13, 2, metadata=True)
             resourceObject.offsetSize, resourceObject.lengthSize = struct.unpack(f'<BB', block)
 
             # set base address
-            block = resourceObject.ioRequest(24, resourceObject.offsetSize)
+            block = resourceObject.ioRequest(24, resourceObject.offsetSize, metadata=True)
             resourceObject.baseAddress = struct.unpack(f'<{SIZE_2_FORMAT[resourceObject.offsetSize]}', block)[0]
 
             # read group offset
-            block = resourceObject.ioRequest(24 + (5 * resourceObject.offsetSize), resourceObject.offsetSize)
+            block = resourceObject.ioRequest(24 + (5 * resourceObject.offsetSize), resourceObject.offsetSize, metadata=True)
             root_group_offset = struct.unpack(f'<{SIZE_2_FORMAT[resourceObject.offsetSize]}', block)[0]
 
         # Super Block Version 1 #
         else:
             # read sizes
-            block = resourceObject.ioRequest(9, 2)
+            block = resourceObject.ioRequest(9, 2, metadata=True)
             resourceObject.offsetSize, resourceObject.lengthSize = struct.unpack(f'<BB', block)
 
             # set base address
-            block = resourceObject.ioRequest(12, resourceObject.offsetSize)
+            block = resourceObject.ioRequest(12, resourceObject.offsetSize, metadata=True)
             resourceObject.baseAddress = struct.unpack(f'<{SIZE_2_FORMAT[resourceObject.offsetSize]}', block)[0]
 
             # read group offset
-            block = resourceObject.ioRequest(12 + (3 * resourceObject.offsetSize), resourceObject.offsetSize)
+            block = resourceObject.ioRequest(12 + (3 * resourceObject.offsetSize), resourceObject.offsetSize, metadata=True)
             root_group_offset = struct.unpack(f'<{SIZE_2_FORMAT[resourceObject.offsetSize]}', block)[0]
 
         # display file information
@@ -1174,7 +1181,7 @@ class H5Dataset:
 
         # read attribute name
         attr_name = self.readArray(name_size).tobytes().decode(char_encoding).strip('\0')
-        attr_path = '/'.join(self.datasetPath[:dlvl] + [attr_name])
+        attr_path = sys.intern('/'.join(self.datasetPath[:dlvl] + [attr_name]))
 
         # pad out name size (version 1 only)
         if version == 1:
@@ -1915,6 +1922,10 @@ class H5Dataset:
                 if self.resourceObject.verbose:
                     log.info(f'entry {node_level}.{e+1} of selected')
 
+                # prefetch next chunk while this one is read
+                if node_level == 0 and self.meta.ndims > 0 and self.resourceObject.enablePrefetch:
+                    self.prefetchChunk(next_node, entries_used - (e + 1))
+
                 # process child entry
                 if node_level > 0:
                     return_position = self.pos
@@ -2026,6 +2037,28 @@ class H5Dataset:
             # goto next key
             curr_node = next_node
 
+    #######################
+    # prefetchChunk
+    #
+    #   called with self.pos at the child address of the next entry;
+    #   only starts once a few chunks have been read so that small
+    #   reads do not pay for speculative ones
+    #######################
+    def prefetchChunk(self, next_node, entries_remaining):
+        self.chunksRead += 1
+        if self.chunksRead < self.PREFETCH_THRESHOLD or entries_remaining <= 0:
+            return
+
+        # check next chunk is part of the hyperslice
+        next_slice = [(start, min(start + extent, dimension)) for start, extent, dimension in zip(next_node['slice'], self.meta.chunkDimensions, self.meta.dimensions)]
+        if not self.hypersliceIntersection(next_slice, 0):
+            return
+
+        # peek at address of next chunk and prefetch it
+        raw = self.resourceObject.ioRequest(self.pos, self.resourceObject.offsetSize, metadata=True)
+        next_child_addr = struct.unpack(f'<{SIZE_2_FORMAT[self.resourceObject.offsetSize]}', raw)[0]
+        self.resourceObject.prefetch(next_child_addr, next_node['chunk_size'])
+
     #######################
     # readBTreeNodeV1
     #######################
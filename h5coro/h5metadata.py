@@ -35,6 +35,9 @@ import numpy
 
 class H5Metadata:
 
+    __slots__ = ('ndims', 'dimensions', 'typeSize', 'type', 'signedval', 'fillsize', 'fillvalue', 'layout', 'size',
+                 'address', 'chunkElements', 'chunkDimensions', 'elementSize', 'isattribute', 'filter')
+
     #######################
     # Constants
     #######################
@@ -0,0 +1,64 @@
+# Copyright (c) 2023, University of Washington
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the University of Washington nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE UNIVERSITY OF WASHINGTON AND CONTRIBUTORS
+# “AS IS” AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE UNIVERSITY OF WASHINGTON OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import sys
+
+###############################################################################
+# H5PathTable Class
+###############################################################################
+
+class H5PathTable(dict):
+
+    #######################
+    # Constructor
+    #
+    #   maps object paths to object header addresses, and indexes
+    #   each path under its parent group so that the contents of a
+    #   group can be listed without scanning every path in the file;
+    #   paths are interned so lookups with interned queries compare
+    #   by identity
+    #######################
+    def __init__(self):
+        super().__init__()
+        self.elements = {}
+
+    #######################
+    # operator: []=
+    #######################
+    def __setitem__(self, path, address):
+        path = sys.intern(path)
+        super().__setitem__(path, address)
+        group, _, element = path.rpartition('/')
+        self.elements.setdefault(sys.intern(group), set()).add(sys.intern(element))
+
+    #######################
+    # children
+    #######################
+    def children(self, group):
+        return tuple(self.elements.get(group, ()))
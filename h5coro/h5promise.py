@@ -27,7 +27,8 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from concurrent.futures import as_completed, ThreadPoolExecutor
+import sys
+from concurrent.futures import wait, as_completed, ALL_COMPLETED
 from threading import Condition, Thread
 from h5coro.h5dataset import H5Dataset
 from h5coro.logger import log
@@ -43,20 +44,22 @@ def datasetThread(resourceObject, dataset, hyperslice, *, earlyExit, metaOnly, e
         log.warn(f'H5Coro encountered error reading {dataset}: {e}')
         return H5Dataset(resourceObject, dataset, hyperslice, makeNull=True, earlyExit=earlyExit, metaOnly=metaOnly, enableAttributes=enableAttributes)
 
+def storeResult(promise, h5dataset):
+    promise.conditions[h5dataset.dataset].acquire()
+    promise.datasets[h5dataset.dataset] = h5dataset
+    promise.conditions[h5dataset.dataset].notify_all()
+    promise.conditions[h5dataset.dataset].release()
+
 def resultThread(promise, futures):
     for future in as_completed(futures):
-        h5dataset = future.result()
-        promise.conditions[h5dataset.dataset].acquire()
-        promise.datasets[h5dataset.dataset] = h5dataset
-        promise.conditions[h5dataset.dataset].notify()
-        promise.conditions[h5dataset.dataset].release()
+        storeResult(promise, future.result())
 
 def massagePath(path):
     if len(path) > 0 and path[0] == '/':
         path = path[1:]
     if len(path) > 0 and path[-1] == '/':
         path = path[:-1]
-    return path
+    return sys.intern(path)
 
 ###############################################################################
 # H5Promise Class
@@ -71,19 +74,27 @@ class H5Promise:
         # initialize dataset values
         self.datasets = {}
         self.conditions = {}
+        self.futures = []
         for dataset in datasetTable:
             self.datasets[dataset] = None
             self.conditions[dataset] = Condition()
 
+        # already on a worker thread - read each dataset inline
+        if resourceObject.inPool():
+            for dataset in datasetTable.values():
+                h5dataset = datasetThread(resourceObject, dataset["dataset"], dataset["hyperslice"], earlyExit=earlyExit, metaOnly=metaOnly, enableAttributes=enableAttributes)
+                self.datasets[h5dataset.dataset] = h5dataset
+            return
+
         # start threads working on each dataset
-        executor = ThreadPoolExecutor(max_workers=len(datasetTable))
-        futures = [executor.submit(datasetThread, resourceObject, dataset["dataset"], dataset["hyperslice"], earlyExit=earlyExit, metaOnly=metaOnly, enableAttributes=enableAttributes) for dataset in datasetTable.values()]
+        self.futures = [resourceObject.executor.submit(datasetThread, resourceObject, dataset["dataset"], dataset["hyperslice"], earlyExit=earlyExit, metaOnly=metaOnly, enableAttributes=enableAttributes) for dataset in datasetTable.values()]
 
         # wait for datasets to be populated OR populate datasets in the background
         if block:
-            resultThread(self, futures)
+            wait(self.futures, return_when=ALL_COMPLETED)
+            resultThread(self, self.futures)
         else:
-            Thread(target=resultThread, args=(self,futures), daemon=True).start()
+            Thread(target=resultThread, args=(self,self.futures), daemon=True).start()
 
     #######################
     # waitOnResult
@@ -95,6 +106,22 @@ class H5Promise:
         self.conditions[dataset].release()
         return self.datasets[dataset] == None
 
+    #######################
+    # asCompleted
+    #
+    #   yields dataset names in the order their reads complete; each
+    #   result is stored before its name is yielded
+    #######################
+    def asCompleted(self, timeout=None):
+        if len(self.futures) == 0:
+            for dataset in self.datasets.keys():
+                yield dataset
+            return
+        for future in as_completed(self.futures, timeout=timeout):
+            h5dataset = future.result()
+            storeResult(self, h5dataset)
+            yield h5dataset.dataset
+
     #######################
     # operator: []
     #######################
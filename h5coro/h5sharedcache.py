@@ -0,0 +1,233 @@
+# Copyright (c) 2023, University of Washington
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the University of Washington nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE UNIVERSITY OF WASHINGTON AND CONTRIBUTORS
+# “AS IS” AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE UNIVERSITY OF WASHINGTON OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from h5coro.logger import log
+
+###############################################################################
+# CONSTANTS
+###############################################################################
+
+MAGIC = b'H5COSC03'
+HEADER_FORMAT = '<8sQQQQQ'  # magic, line size, number of slabs, number of slots, next free slab, generation
+HEADER_SIZE = 4096          # header padded out to a page
+SLOT_FORMAT = '<QQQ'        # resource key, cache line, line length
+SLOT_SIZE = 32              # slot plus slab index (written last to publish the slot)
+SLAB_OFFSET = 24            # offset of the slab index within a slot
+NEXT_SLAB_OFFSET = 32       # offset of the next free slab within the header
+GENERATION_OFFSET = 40      # offset of the generation within the header
+MAX_PROBES = 32
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+###############################################################################
+# Local Functions
+###############################################################################
+
+def mix64(key):
+    # splitmix64 finalizer - spreads consecutive keys over all 64 bits
+    key = (key + 0x9E3779B97F4A7C15) & HASH_MASK
+    key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+    key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+    return key ^ (key >> 31)
+
+###############################################################################
+# H5SharedCache Class
+###############################################################################
+
+class H5SharedCache:
+
+    #######################
+    # Constructor
+    #
+    #   a cache of lines kept in a memory mapped file so that every
+    #   process reading the same resource shares the lines read by
+    #   any of them; the file is laid out as a header, an open
+    #   addressed table of slots keyed by (resource, cache line), and
+    #   an array of slabs each holding one line; writers serialize on
+    #   an flock of the file (other processes) and a thread lock (this
+    #   process), and when the slabs run out the table is cleared and
+    #   the slabs reused - readers take no lock and instead discard a
+    #   line if the header changed while copying it
+    #######################
+    def __init__(self, path, resource, lineSize, size):
+        self.path = path
+        self.resourceKey = struct.unpack('<Q', hashlib.blake2b(resource.encode('utf-8'), digest_size=8).digest())[0]
+        self.lineSize = lineSize
+        self.numSlabs = max(size // lineSize, 1)
+        self.numSlots = self.numSlabs * 2
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.lock = threading.Lock()
+
+        # initialize file (if new, or laid out for a different line size)
+        with self.locked():
+            header = os.pread(self.fd, struct.calcsize(HEADER_FORMAT), 0)
+            valid = len(header) == struct.calcsize(HEADER_FORMAT) and header[:len(MAGIC)] == MAGIC
+            if valid:
+                header = struct.unpack(HEADER_FORMAT, header)
+            if valid and header[1] == lineSize:
+                _, _, self.numSlabs, self.numSlots, _, _ = header
+            else:
+                # advance the generation so readers of the old layout discard what they copy
+                generation = valid and (header[5] + 1) or 0
+                self.slabs = self.slabsOffset(self.numSlots)
+                file_size = self.slabs + (self.numSlabs * lineSize)
+                if os.fstat(self.fd).st_size < file_size:
+                    os.ftruncate(self.fd, file_size) # never shrink - other processes may have it mapped
+                os.pwrite(self.fd, bytes(self.slabs - HEADER_SIZE), HEADER_SIZE)
+                os.pwrite(self.fd, struct.pack(HEADER_FORMAT, MAGIC, lineSize, self.numSlabs, self.numSlots, 0, generation), 0)
+
+        # map file
+        self.slabs = self.slabsOffset(self.numSlots)
+        self.mm = mmap.mmap(self.fd, self.slabs + (self.numSlabs * lineSize))
+
+    #######################
+    # Destructor
+    #######################
+    def __del__(self):
+        if hasattr(self, 'fd'):
+            os.close(self.fd)
+
+    #######################
+    # locked
+    #
+    #   an flock held on this file descriptor does not exclude other
+    #   threads using the same descriptor, so they also take the lock
+    #######################
+    @contextmanager
+    def locked(self):
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    #######################
+    # slabsOffset
+    #######################
+    @staticmethod
+    def slabsOffset(num_slots):
+        table_end = HEADER_SIZE + (num_slots * SLOT_SIZE)
+        return table_end + ((mmap.PAGESIZE - (table_end % mmap.PAGESIZE)) % mmap.PAGESIZE)
+
+    #######################
+    # matches
+    #
+    #   False when another process has since laid the file out
+    #   differently, in which case this instance stops using it
+    #######################
+    def matches(self, header):
+        return header[:4] == (MAGIC, self.lineSize, self.numSlabs, self.numSlots)
+
+    #######################
+    # probe
+    #
+    #   returns (slot offset, slab index) of the slot holding the
+    #   cache line, or of the first empty slot (slab index 0) found
+    #   before it; returns (None, 0) when the probe limit is reached
+    #######################
+    def probe(self, cache_line):
+        # home slot from the high bits of the mixed (resource, line index)
+        slot = (mix64(self.resourceKey ^ (cache_line // self.lineSize)) * self.numSlots) >> 64
+        for _ in range(min(MAX_PROBES, self.numSlots)):
+            offset = HEADER_SIZE + (slot * SLOT_SIZE)
+            slab = struct.unpack_from('<Q', self.mm, offset + SLAB_OFFSET)[0]
+            if slab == 0:
+                return offset, 0
+            resource_key, line, _ = struct.unpack_from(SLOT_FORMAT, self.mm, offset)
+            if resource_key == self.resourceKey and line == cache_line:
+                return offset, slab
+            slot = (slot + 1) % self.numSlots
+        return None, 0
+
+    #######################
+    # lookup
+    #
+    #   returns a copy of the line, since its slab may be reused
+    #   once the line has been returned
+    #######################
+    def lookup(self, cache_line):
+        header = struct.unpack_from(HEADER_FORMAT, self.mm, 0)
+        if not self.matches(header):
+            return None
+        offset, slab = self.probe(cache_line)
+        if slab == 0:
+            return None
+        length = struct.unpack_from(SLOT_FORMAT, self.mm, offset)[2]
+        start = self.slabs + ((slab - 1) * self.lineSize)
+        line = self.mm[start:start+length]
+        after = struct.unpack_from(HEADER_FORMAT, self.mm, 0)
+        if not self.matches(after) or after[5] != header[5]:
+            return None # cleared or reformatted while copying
+        return memoryview(line)
+
+    #######################
+    # clear
+    #
+    #   empties the table and frees every slab; the generation is
+    #   advanced last so readers that copied a line before the table
+    #   was emptied discard it (must hold the file lock)
+    #######################
+    def clear(self, generation):
+        self.mm[HEADER_SIZE:self.slabs] = bytes(self.slabs - HEADER_SIZE)
+        struct.pack_into('<Q', self.mm, NEXT_SLAB_OFFSET, 0)
+        struct.pack_into('<Q', self.mm, GENERATION_OFFSET, generation + 1)
+
+    #######################
+    # insert
+    #
+    #   clears the cache when its slabs run out, which also reclaims
+    #   the lines of resources (and versions) no longer being read
+    #######################
+    def insert(self, cache_line, line):
+        with self.locked():
+            header = struct.unpack_from(HEADER_FORMAT, self.mm, 0)
+            if not self.matches(header):
+                return # file laid out by another process
+            offset, slab = self.probe(cache_line)
+            if offset == None or slab != 0:
+                return # no room in table or already present
+            next_slab = header[4]
+            if next_slab >= self.numSlabs:
+                log.info(f'H5Coro shared cache {self.path} is full, clearing it')
+                self.clear(header[5])
+                offset, _ = self.probe(cache_line)
+                next_slab = 0
+            # write data, then slot, then publish slot with its slab index
+            start = self.slabs + (next_slab * self.lineSize)
+            self.mm[start:start+len(line)] = line
+            struct.pack_into(SLOT_FORMAT, self.mm, offset, self.resourceKey, cache_line, len(line))
+            struct.pack_into('<Q', self.mm, offset + SLAB_OFFSET, next_slab + 1)
+            struct.pack_into('<Q', self.mm, NEXT_SLAB_OFFSET, next_slab + 1)
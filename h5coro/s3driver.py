@@ -77,3 +77,9 @@ class S3Driver:
     def read(self, pos, size):
         stream = self.obj.get(Range=f"bytes={pos}-{pos+size-1}")["Body"]
         return stream.read()
+
+    #######################
+    # version
+    #######################
+    def version(self):
+        return self.obj.e_tag
@@ -39,6 +39,18 @@ class HTTPDriver:
             self.token = credentials
             self.session.headers.update({"Authorization": f"Bearer {self.token}"})
 
+    #######################
+    # version
+    #
+    #   returns None when the version cannot be determined (for
+    #   example, an error page has its own ETag)
+    #######################
+    def version(self):
+        response = self.session.head(self.resource, allow_redirects=True)
+        if not response.ok:
+            return None
+        return response.headers.get("ETag", response.headers.get("Last-Modified"))
+
     #######################
     # read
     #######################
@@ -1,4 +1,6 @@
 import pytest
+import numpy as np
+from h5coro import filedriver
 
 def pytest_addoption(parser):
     parser.addoption("--daac", action="store", default="NSIDC")
@@ -10,3 +12,39 @@ def daac(request):
         pytest.skip()
     return daac_value
 
+
+class CountingDriver(filedriver.FileDriver):
+
+    def __init__(self, resource, credentials):
+        super().__init__(resource, credentials)
+        self.requests = []
+        self.error = None
+        self.gate = None
+
+    def read(self, pos, size):
+        self.requests.append((pos, size))
+        if self.gate != None:
+            self.gate.wait()
+        if self.error != None:
+            raise self.error
+        return super().read(pos, size)
+
+@pytest.fixture(scope='session')
+def h5file(tmp_path_factory):
+    h5py = pytest.importorskip("h5py")
+    path = tmp_path_factory.mktemp("h5coro") / "test.h5"
+    with h5py.File(path, "w", libver="earliest") as f:
+        f.create_dataset("data", data=np.arange(0x40000, dtype='<i4'))
+        x = f.create_dataset("gt1/x", data=np.arange(10))
+        x.attrs["units"] = np.bytes_("meters")
+        x.attrs["valid_max"] = np.array([255], dtype='<i4')
+        f.create_dataset("gt1r/y", data=np.arange(10))
+        f.create_dataset("gt1r/z", data=np.arange(10))
+        f.create_dataset("chunked", data=np.arange(20000, dtype='<f8'), chunks=(1000,))
+        dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+        dcpl.set_layout(h5py.h5d.COMPACT)
+        compact = h5py.h5d.create(f.id, b"compact", h5py.h5t.STD_I32LE, h5py.h5s.create_simple((16,)), dcpl=dcpl)
+        compact.write(h5py.h5s.ALL, h5py.h5s.ALL, np.arange(16, dtype='<i4'))
+    with open(path, "rb") as f:
+        contents = f.read()
+    return str(path), contents
@@ -0,0 +1,212 @@
+import threading
+import time
+import pytest
+import h5coro
+from h5coro.h5cache import H5Cache
+from tests.conftest import CountingDriver
+
+LINE_SIZE = 0x1000
+DATA_LINE = 0x40000 # well past the superblock and object headers
+
+def openResource(h5file, **kwargs):
+    h5obj = h5coro.H5Coro(h5file[0], CountingDriver, cacheLineSize=LINE_SIZE, metaCacheLineSize=LINE_SIZE, **kwargs)
+    h5obj.driver.requests = []
+    return h5obj
+
+def waitForRead(h5obj):
+    for _ in range(5000):
+        if len(h5obj.driver.requests) > 0:
+            return
+        time.sleep(0.001)
+
+class TestH5Cache:
+
+    def test_lru_eviction(self):
+        cache = H5Cache(4, 12)
+        for cache_line in (0, 4, 8):
+            cache.insert(cache_line, b'abcd')
+        cache.lookup(0)
+        cache.insert(12, b'efgh')
+        assert cache.lookup(4) is None
+        assert cache.lookup(0) == b'abcd'
+        assert cache.lookup(8) == b'abcd'
+        assert cache.lookup(12) == b'efgh'
+        assert cache.size == 12
+
+    def test_reinsert_accounting(self):
+        cache = H5Cache(4, 12)
+        cache.insert(0, b'ab')
+        cache.insert(0, b'abcd')
+        assert cache.size == 4
+        assert len(cache.lines) == 1
+
+    def test_reserve(self):
+        cache = H5Cache(4, 12)
+        line, future, owner = cache.reserve(0)
+        assert line is None and owner
+        line, waiter, owner = cache.reserve(0)
+        assert line is None and not owner and waiter is future
+        cache.insert(0, b'abcd')
+        assert future.result(timeout=0) == b'abcd'
+        assert cache.reserve(0) == (b'abcd', None, False)
+        assert len(cache.inflight) == 0
+
+    def test_fail(self):
+        cache = H5Cache(4, 12)
+        _, future, _ = cache.reserve(0)
+        cache.fail(0, RuntimeError('read failed'))
+        with pytest.raises(RuntimeError):
+            future.result(timeout=0)
+        _, _, owner = cache.reserve(0)
+        assert owner
+
+class TestIoRequest:
+
+    def test_cache_limit(self, h5file):
+        h5obj = openResource(h5file, cacheLimit=LINE_SIZE * 4)
+        for i in range(8):
+            pos = DATA_LINE + (i * LINE_SIZE)
+            assert bytes(h5obj.ioRequest(pos, 64)) == h5file[1][pos:pos+64]
+        assert h5obj.cache.size == LINE_SIZE * 4
+        assert len(h5obj.cache.lines) == 4
+
+    def test_coalesce_misses(self, h5file):
+        h5obj = openResource(h5file)
+        h5obj.ioRequest(DATA_LINE, LINE_SIZE * 3)
+        assert h5obj.driver.requests == [(DATA_LINE, LINE_SIZE * 3)]
+        h5obj.driver.requests = []
+        h5obj.ioRequest(DATA_LINE + (LINE_SIZE * 4), 1)
+        h5obj.ioRequest(DATA_LINE + (LINE_SIZE * 3), LINE_SIZE * 3)
+        assert h5obj.driver.requests == [(DATA_LINE + (LINE_SIZE * 4), LINE_SIZE), (DATA_LINE + (LINE_SIZE * 3), LINE_SIZE), (DATA_LINE + (LINE_SIZE * 5), LINE_SIZE)]
+        h5obj.driver.requests = []
+        h5obj.ioRequest(DATA_LINE, LINE_SIZE * 3)
+        assert h5obj.driver.requests == []
+
+    def test_multiline_assembly(self, h5file):
+        h5obj = openResource(h5file)
+        for pos, size in ((DATA_LINE + 10, LINE_SIZE * 2), (DATA_LINE - 1, 2), (DATA_LINE + 100, (LINE_SIZE * 3) - 200), (DATA_LINE, LINE_SIZE * 3)):
+            assert bytes(h5obj.ioRequest(pos, size)) == h5file[1][pos:pos+size]
+
+    def test_memoryviews(self, h5file):
+        h5obj = openResource(h5file)
+        for pos, size, caching in ((DATA_LINE + 16, 32, True), (DATA_LINE + 16, LINE_SIZE * 2, True), (DATA_LINE, LINE_SIZE * 8, True), (DATA_LINE + 16, 32, False)):
+            data = h5obj.ioRequest(pos, size, caching=caching)
+            assert type(data) == memoryview
+            assert bytes(data) == h5file[1][pos:pos+size]
+
+    def test_shared_read(self, h5file):
+        h5obj = openResource(h5file)
+        h5obj.driver.gate = threading.Event()
+        results = {}
+        def reader(name, pos):
+            results[name] = bytes(h5obj.ioRequest(pos, 64))
+        first = threading.Thread(target=reader, args=('first', DATA_LINE))
+        first.start()
+        waitForRead(h5obj)
+        second = threading.Thread(target=reader, args=('second', DATA_LINE + 128))
+        second.start()
+        time.sleep(0.05)
+        h5obj.driver.gate.set()
+        first.join(timeout=5)
+        second.join(timeout=5)
+        assert h5obj.driver.requests == [(DATA_LINE, LINE_SIZE)]
+        assert results['first'] == h5file[1][DATA_LINE:DATA_LINE+64]
+        assert results['second'] == h5file[1][DATA_LINE+128:DATA_LINE+192]
+
+    def test_failed_read(self, h5file):
+        h5obj = openResource(h5file)
+        h5obj.driver.error = OSError('read failed')
+        with pytest.raises(OSError):
+            h5obj.ioRequest(DATA_LINE, LINE_SIZE * 2)
+        assert len(h5obj.cache.inflight) == 0
+        h5obj.driver.error = None
+        assert bytes(h5obj.ioRequest(DATA_LINE, 64)) == h5file[1][DATA_LINE:DATA_LINE+64]
+
+    def test_interrupted_read(self, h5file):
+        h5obj = openResource(h5file)
+        h5obj.driver.error = KeyboardInterrupt()
+        with pytest.raises(KeyboardInterrupt):
+            h5obj.ioRequest(DATA_LINE, LINE_SIZE * 2)
+        assert len(h5obj.cache.inflight) == 0
+        h5obj.driver.error = None
+        assert bytes(h5obj.ioRequest(DATA_LINE, 64)) == h5file[1][DATA_LINE:DATA_LINE+64]
+
+    def test_failed_waiter(self, h5file):
+        for error, expected in ((OSError('read failed'), (OSError,)), (KeyboardInterrupt(), (KeyboardInterrupt, RuntimeError))):
+            h5obj = openResource(h5file)
+            h5obj.driver.gate = threading.Event()
+            h5obj.driver.error = error
+            errors = {}
+            def reader(name):
+                try:
+                    h5obj.ioRequest(DATA_LINE, 64)
+                except BaseException as e:
+                    errors[name] = e
+            first = threading.Thread(target=reader, args=('first',))
+            first.start()
+            waitForRead(h5obj)
+            second = threading.Thread(target=reader, args=('second',))
+            second.start()
+            time.sleep(0.05)
+            h5obj.driver.gate.set()
+            first.join(timeout=5)
+            second.join(timeout=5)
+            assert not second.is_alive()
+            assert type(errors['first']) == type(error)
+            assert type(errors['second']) in expected
+
+    def test_bypass(self, h5file):
+        h5obj = openResource(h5file)
+        assert h5obj.bypassCacheThreshold == LINE_SIZE * 4
+        data = h5obj.ioRequest(DATA_LINE + 1, LINE_SIZE * 4)
+        assert bytes(data) == h5file[1][DATA_LINE+1:DATA_LINE+1+(LINE_SIZE*4)]
+        assert h5obj.driver.requests == [(DATA_LINE + 1, LINE_SIZE * 4)]
+        assert len(h5obj.cache.lines) == 0
+        h5obj = openResource(h5file, bypassCacheThreshold=LINE_SIZE * 8)
+        h5obj.ioRequest(DATA_LINE + 1, LINE_SIZE * 4)
+        assert len(h5obj.cache.lines) == 5
+
+    def test_prefetch_bypass(self, h5file):
+        h5obj = openResource(h5file, enablePrefetch=True)
+        h5obj.prefetch(DATA_LINE, LINE_SIZE * 4)
+        h5obj.prefetch(DATA_LINE + (LINE_SIZE * 8), LINE_SIZE * 2)
+        h5obj.prefetchExecutor.shutdown(wait=True)
+        assert h5obj.driver.requests == [(DATA_LINE + (LINE_SIZE * 8), LINE_SIZE * 2)]
+        assert len(h5obj.cache.lines) == 2
+
+class TestMetaCache:
+
+    def test_line_size(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, cacheLineSize=LINE_SIZE)
+        assert h5obj.metaCache.lineSize == LINE_SIZE
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, cacheLineSize=LINE_SIZE, metaCacheLineSize=LINE_SIZE * 4)
+        assert h5obj.metaCache.lineSize == LINE_SIZE * 4
+
+    def test_separate(self, h5file):
+        h5obj = openResource(h5file)
+        h5obj.readDatasets(["gt1/x", "gt1r/y"], metaOnly=True)
+        assert len(h5obj.metaCache.lines) > 0
+        assert len(h5obj.cache.lines) == 0
+        h5obj.ioRequest(DATA_LINE, 64)
+        assert len(h5obj.cache.lines) == 1
+
+    def test_shared_metadata(self, h5file, tmp_path):
+        pytest.importorskip("fcntl")
+        kwargs = {"cacheLineSize": LINE_SIZE * 16, "sharedCache": str(tmp_path / "shared.cache")}
+        first = h5coro.H5Coro(h5file[0], CountingDriver, **kwargs)
+        first.readDatasets(["gt1/x", "gt1r/y", "compact"], metaOnly=True)
+        assert first.sharesCache(first.metaCache)
+        assert len(first.driver.requests) > 0
+        second = h5coro.H5Coro(h5file[0], CountingDriver, **kwargs)
+        second.readDatasets(["gt1/x", "gt1r/y", "compact"], metaOnly=True)
+        assert second.driver.requests == []
+
+class TestSingleLine:
+
+    def test_slice(self, h5file):
+        h5obj = openResource(h5file)
+        for pos, size in ((DATA_LINE + 16, 32), (DATA_LINE, LINE_SIZE), (DATA_LINE + LINE_SIZE - 1, 1)):
+            data = h5obj.ioRequest(pos, size)
+            assert bytes(data) == h5file[1][pos:pos+size]
+            assert data.obj is h5obj.cache.lookup(DATA_LINE).obj
+        assert h5obj.driver.requests == [(DATA_LINE, LINE_SIZE)]
@@ -0,0 +1,44 @@
+import weakref
+import pytest
+import numpy as np
+import h5coro
+from tests.conftest import CountingDriver
+
+class TestH5Coro:
+
+    def test_shared_pool(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, ioConcurrency=2)
+        executor = h5obj.executor
+        for _ in range(3):
+            promise = h5obj.readDatasets(["gt1/x", "gt1r/y", "gt1r/z", "chunked"])
+            assert np.array_equal(promise["gt1r/z"], np.arange(10))
+            assert np.array_equal(promise["chunked"], np.arange(20000))
+        assert h5obj.executor is executor
+        assert len(executor._threads) <= 2
+
+    def test_inline(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, ioConcurrency=1)
+        def worker():
+            assert h5obj.inPool()
+            promise = h5obj.readDatasets(["gt1/x", "gt1r/y"])
+            return promise["gt1/x"], promise["gt1r/y"]
+        x, y = h5obj.executor.submit(worker).result(timeout=10)
+        assert np.array_equal(x, np.arange(10))
+        assert np.array_equal(y, np.arange(10))
+        assert not h5obj.inPool()
+
+    def test_close(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, enablePrefetch=True)
+        h5obj.close()
+        with pytest.raises(RuntimeError):
+            h5obj.readDatasets(["gt1/x"])
+        with pytest.raises(RuntimeError):
+            h5obj.prefetchExecutor.submit(print)
+
+    def test_attributes(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, cacheLineSize=0x1000)
+        assert h5obj.cacheLineSize == 0x1000
+        assert h5obj.cacheLineMask == h5obj.cache.lineMask
+        assert weakref.ref(h5obj)() is h5obj
+        with pytest.raises(AttributeError):
+            h5obj.undeclared = True
@@ -0,0 +1,61 @@
+import numpy as np
+import h5coro
+from h5coro.h5dataset import H5Dataset
+from tests.conftest import CountingDriver
+
+LINE_SIZE = 0x1000
+CHUNK_SIZE = 8000 # 1000 doubles, uncompressed
+
+class PrefetchRecorder(h5coro.H5Coro):
+
+    def prefetch(self, pos, size):
+        self.prefetched.append((pos, size))
+        super().prefetch(pos, size)
+
+def readChunked(h5file, enablePrefetch, hyperslice=[]):
+    h5obj = PrefetchRecorder(h5file[0], CountingDriver, cacheLineSize=LINE_SIZE, metaCacheLineSize=LINE_SIZE, enablePrefetch=enablePrefetch)
+    h5obj.prefetched = []
+    h5obj.driver.requests = []
+    values = h5obj.readDatasets([{"dataset": "chunked", "hyperslice": hyperslice}])["chunked"]
+    if h5obj.prefetchExecutor != None:
+        h5obj.prefetchExecutor.shutdown(wait=True)
+    return h5obj, values
+
+class TestPrefetchChunk:
+
+    def test_prefetch(self, h5file):
+        h5obj, values = readChunked(h5file, True)
+        assert np.array_equal(values, np.arange(20000))
+        # every chunk after the first few is prefetched, except the last which has no successor
+        assert len(h5obj.prefetched) == 20 - H5Dataset.PREFETCH_THRESHOLD
+        assert all(size == CHUNK_SIZE for _, size in h5obj.prefetched)
+        # prefetched chunks are not read a second time
+        assert len(h5obj.driver.requests) == len(set(h5obj.driver.requests))
+
+    def test_hyperslice(self, h5file):
+        h5obj, values = readChunked(h5file, True, [[0, 4500]])
+        assert np.array_equal(values, np.arange(4500))
+        assert len(h5obj.prefetched) == 5 - H5Dataset.PREFETCH_THRESHOLD
+
+    def test_disabled(self, h5file):
+        h5obj, values = readChunked(h5file, False)
+        assert np.array_equal(values, np.arange(20000))
+        assert h5obj.prefetched == []
+
+class TestHeaderValues:
+
+    def test_attributes(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, cacheLineSize=LINE_SIZE)
+        h5obj.readDatasets(["gt1/x"], metaOnly=True)
+        h5obj.driver.requests = []
+        _, attributes, _ = h5obj.inspectPath("gt1/x")
+        assert attributes["units"] == "meters"
+        assert np.array_equal(attributes["valid_max"], [255])
+        assert h5obj.driver.requests == []
+
+    def test_compact(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, cacheLineSize=LINE_SIZE)
+        h5obj.readDatasets(["compact"], metaOnly=True)
+        h5obj.driver.requests = []
+        assert np.array_equal(h5obj.readDatasets(["compact"])["compact"], np.arange(16))
+        assert h5obj.driver.requests == []
@@ -0,0 +1,31 @@
+import h5coro
+from h5coro.h5paths import H5PathTable
+from tests.conftest import CountingDriver
+
+class TestH5PathTable:
+
+    def test_children(self):
+        table = H5PathTable()
+        for path in ('gt1', 'gt1/x', 'gt1r', 'gt1r/y', 'gt1r/z', 'gt1r/y/units'):
+            table[path] = 0
+        assert set(table.children('')) == {'gt1', 'gt1r'}
+        assert set(table.children('gt1')) == {'x'}
+        assert set(table.children('gt1r')) == {'y', 'z'}
+        assert set(table.children('gt1r/y')) == {'units'}
+        assert table.children('gt2') == ()
+
+    def test_inspect_prefix(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver)
+        h5obj.list('gt1r')
+        links, _, _ = h5obj.inspectPath('gt1', w_attr=False)
+        assert links == {'x'}
+        variables, _, _ = h5obj.list('gt1')
+        assert set(variables.keys()) == {'x'}
+
+    def test_attributes(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver)
+        h5obj.list('gt1', w_attr=True)
+        variables, attributes, _ = h5obj.list('gt1', w_attr=True)
+        assert set(variables.keys()) == {'x'}
+        assert attributes == {}
+        assert set(variables['x'].keys()) == {'__metadata__', 'units', 'valid_max'}
@@ -0,0 +1,45 @@
+import threading
+import pytest
+import numpy as np
+import h5coro
+from tests.conftest import CountingDriver
+
+DATASETS = ["gt1/x", "gt1r/y", "gt1r/z", "chunked"]
+
+class TestH5Promise:
+
+    def test_block(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver)
+        promise = h5obj.readDatasets(DATASETS, block=True)
+        assert all(future.done() for future in promise.futures)
+        assert all(promise.datasets[dataset] is not None for dataset in DATASETS)
+        assert set(promise.asCompleted()) == set(DATASETS)
+        assert np.array_equal(promise.datasets["chunked"].values, np.arange(20000))
+
+    def test_block_error(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver)
+        h5obj.driver.error = OSError("read failed")
+        with pytest.raises(OSError):
+            h5obj.readDatasets(DATASETS, block=True)
+
+    def test_as_completed(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver)
+        h5obj.driver.gate = threading.Event()
+        threading.Timer(0.05, h5obj.driver.gate.set).start()
+        promise = h5obj.readDatasets(DATASETS, block=False)
+        completed = []
+        for dataset in promise.asCompleted(timeout=10):
+            assert promise.datasets[dataset] is not None
+            completed.append(dataset)
+        assert sorted(completed) == sorted(DATASETS)
+        assert np.array_equal(promise["gt1r/z"], np.arange(10))
+
+    def test_inline(self, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], CountingDriver, ioConcurrency=1)
+        def worker():
+            promise = h5obj.readDatasets(DATASETS, block=False)
+            return promise, list(promise.asCompleted())
+        promise, completed = h5obj.executor.submit(worker).result(timeout=10)
+        assert promise.futures == []
+        assert sorted(completed) == sorted(DATASETS)
+        assert all(promise.datasets[dataset] is not None for dataset in DATASETS)
@@ -0,0 +1,144 @@
+import threading
+import time
+import pytest
+import numpy as np
+import h5coro
+from tests.conftest import CountingDriver
+
+pytest.importorskip("fcntl")
+
+from h5coro.h5sharedcache import H5SharedCache, MAX_PROBES, NEXT_SLAB_OFFSET
+
+LINE_SIZE = 0x1000
+NUM_LINES = MAX_PROBES * 8
+
+def makeLine(i, size=LINE_SIZE):
+    return bytes([i % 256, (i // 256) % 256]) * (size // 2)
+
+class YieldingCache(H5SharedCache):
+
+    # give up the GIL between finding a slot and filling it
+    def probe(self, cache_line):
+        result = super().probe(cache_line)
+        time.sleep(0)
+        return result
+
+class UnversionedDriver(CountingDriver):
+
+    def version(self):
+        return None
+
+class HeadResponse:
+
+    def __init__(self, status, headers):
+        self.ok = status < 400
+        self.headers = headers
+
+class HeadSession:
+
+    def __init__(self, status, headers):
+        self.response = HeadResponse(status, headers)
+
+    def head(self, url, allow_redirects):
+        return self.response
+
+class TestH5SharedCache:
+
+    def test_many_lines(self, tmp_path):
+        path = str(tmp_path / "shared.cache")
+        writer = H5SharedCache(path, "resource", LINE_SIZE, LINE_SIZE * NUM_LINES)
+        for i in range(NUM_LINES):
+            writer.insert(i * LINE_SIZE, makeLine(i))
+        reader = H5SharedCache(path, "resource", LINE_SIZE, LINE_SIZE * NUM_LINES)
+        for i in range(NUM_LINES):
+            assert reader.lookup(i * LINE_SIZE) == makeLine(i), i
+
+    def test_resources(self, tmp_path):
+        path = str(tmp_path / "shared.cache")
+        first = H5SharedCache(path, "first", LINE_SIZE, LINE_SIZE * NUM_LINES)
+        second = H5SharedCache(path, "second", LINE_SIZE, LINE_SIZE * NUM_LINES)
+        first.insert(0, makeLine(1))
+        assert second.lookup(0) is None
+        second.insert(0, makeLine(2))
+        assert first.lookup(0) == makeLine(1)
+        assert second.lookup(0) == makeLine(2)
+
+    def test_threaded_insert(self, tmp_path):
+        line_size, num_lines, num_threads = 0x100, 2000, 64
+        cache = YieldingCache(str(tmp_path / "shared.cache"), "resource", line_size, line_size * num_lines)
+        def writer(t):
+            for i in range(t, num_lines, num_threads):
+                cache.insert(i * line_size, makeLine(i, line_size))
+        threads = [threading.Thread(target=writer, args=(t,)) for t in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(num_lines):
+            assert cache.lookup(i * line_size) == makeLine(i, line_size), i
+        assert int.from_bytes(cache.mm[NEXT_SLAB_OFFSET:NEXT_SLAB_OFFSET+8], 'little') == num_lines
+
+    def test_shared_reads(self, tmp_path, h5file):
+        path = str(tmp_path / "shared.cache")
+        kwargs = {"cacheLineSize": LINE_SIZE, "sharedCache": path, "sharedCacheSize": LINE_SIZE * NUM_LINES * 2}
+        first = h5coro.H5Coro(h5file[0], CountingDriver, **kwargs)
+        expected = [bytes(first.ioRequest(i * LINE_SIZE, LINE_SIZE)) for i in range(NUM_LINES)]
+        second = h5coro.H5Coro(h5file[0], CountingDriver, **kwargs)
+        assert [bytes(second.ioRequest(i * LINE_SIZE, LINE_SIZE)) for i in range(NUM_LINES)] == expected
+        assert len(first.driver.requests) > MAX_PROBES
+        assert second.driver.requests == []
+
+    def test_full(self, tmp_path):
+        path = str(tmp_path / "shared.cache")
+        cache = H5SharedCache(path, "resource", LINE_SIZE, LINE_SIZE * 8)
+        for i in range(20):
+            cache.insert(i * LINE_SIZE, makeLine(i))
+            assert cache.lookup(i * LINE_SIZE) == makeLine(i)
+        assert cache.lookup(0) is None
+        assert sum(cache.lookup(i * LINE_SIZE) is not None for i in range(20)) <= 8
+
+    def test_layout_change(self, tmp_path):
+        path = str(tmp_path / "shared.cache")
+        first = H5SharedCache(path, "resource", LINE_SIZE, LINE_SIZE * 8)
+        first.insert(0, makeLine(1))
+        second = H5SharedCache(path, "resource", LINE_SIZE * 2, LINE_SIZE * 8)
+        assert second.lookup(0) is None
+        assert first.lookup(0) is None
+        first.insert(0, makeLine(1))
+        second.insert(0, makeLine(2, LINE_SIZE * 2))
+        assert second.lookup(0) == makeLine(2, LINE_SIZE * 2)
+        assert first.lookup(0) is None
+        third = H5SharedCache(path, "resource", LINE_SIZE * 2, LINE_SIZE)
+        assert third.lookup(0) == makeLine(2, LINE_SIZE * 2)
+
+    def test_version(self, tmp_path):
+        h5py = pytest.importorskip("h5py")
+        resource = str(tmp_path / "test.h5")
+        path = str(tmp_path / "shared.cache")
+        kwargs = {"cacheLineSize": LINE_SIZE, "sharedCache": path}
+        for values in (np.arange(0x10000), np.arange(0x20000) * 2):
+            with h5py.File(resource, "w") as f:
+                f.create_dataset("data", data=values)
+            with open(resource, "rb") as f:
+                contents = f.read()
+            h5obj = h5coro.H5Coro(resource, CountingDriver, **kwargs)
+            for i in range(len(contents) // LINE_SIZE):
+                assert bytes(h5obj.ioRequest(i * LINE_SIZE, LINE_SIZE)) == contents[i*LINE_SIZE:(i+1)*LINE_SIZE], i
+            assert np.array_equal(h5obj.readDatasets(["data"])["data"], values)
+
+    def test_unknown_version(self, tmp_path, h5file):
+        h5obj = h5coro.H5Coro(h5file[0], UnversionedDriver, sharedCache=str(tmp_path / "shared.cache"))
+        assert h5obj.sharedCache == None
+        assert np.array_equal(h5obj.readDatasets(["gt1/x"])["gt1/x"], np.arange(10))
+
+    def test_http_version(self):
+        pytest.importorskip("requests")
+        from h5coro.webdriver import HTTPDriver
+        driver = HTTPDriver("https://example.com/test.h5", None)
+        for status, headers, version in ((200, {"ETag": '"abc"', "Last-Modified": "yesterday"}, '"abc"'),
+                                         (200, {"Last-Modified": "yesterday"}, "yesterday"),
+                                         (200, {}, None),
+                                         (403, {"ETag": '"error-page"'}, None),
+                                         (404, {}, None)):
+            driver.session = HeadSession(status, headers)
+            assert driver.version() == version